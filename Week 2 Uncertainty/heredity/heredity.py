@@ -1,7 +1,18 @@
 import csv
-import itertools
+import os
 import sys
 
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+_NUMBA_AVAILABLE = numba is not None
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -36,6 +47,9 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Number of configurations above which work is spread across processes
+PARALLEL_THRESHOLD = 1 << 20
+
 
 def main():
 
@@ -44,6 +58,28 @@ def main():
         sys.exit("Usage: python heredity.py data.csv")
     people = load_data(sys.argv[1])
 
+    names = list(people)
+
+    # Encode every configuration of genes and traits as rows of arrays
+    gene_rows, trait_rows = configurations(people, names)
+    mother_idx, father_idx = parent_indices(people, names)
+    table = factor_table(mother_idx, father_idx)
+    shared = (gene_rows, mother_idx, father_idx, table)
+
+    # Sum joint probabilities by each person's gene count and trait, in chunks of
+    # trait configurations small enough to bound memory, spread across processes
+    # when there is more than one chunk
+    chunk_size = max(1, PARALLEL_THRESHOLD // len(gene_rows))
+    chunks = [trait_rows[k:k + chunk_size] for k in range(0, len(trait_rows), chunk_size)]
+    if len(chunks) == 1:
+        results = [accumulate(chunks[0], *shared)]
+    else:
+        workers = min(os.cpu_count() or 1, len(chunks))
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=shared) as executor:
+            results = list(executor.map(_accumulate_chunk, chunks))
+    gene_totals = sum(gene_chunk for gene_chunk, _ in results)
+    trait_totals = sum(trait_chunk for _, trait_chunk in results)
+
     # Keep track of gene and trait probabilities for each person
     probabilities = {
         person: {
@@ -60,26 +96,11 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    for i, person in enumerate(names):
+        for num_genes in probabilities[person]["gene"]:
+            probabilities[person]["gene"][num_genes] += gene_totals[i, num_genes]
+        for trait in probabilities[person]["trait"]:
+            probabilities[person]["trait"][trait] += trait_totals[i, int(trait)]
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
@@ -116,16 +137,211 @@ def load_data(filename):
     return data
 
 
-def powerset(s):
+def powerset(n):
+    """
+    Yield every subset of `n` people as an integer bitmask, where bit `i`
+    is set if the person at index `i` is in the subset.
+    """
+    for mask in range(1 << n):
+        yield mask
+
+
+def submasks(mask):
+    """
+    Yield every subset of bitmask `mask`, from `mask` itself down to 0.
+    """
+    sub = mask
+    while True:
+        yield sub
+        if sub == 0:
+            return
+        sub = (sub - 1) & mask
+
+
+def configurations(people, names):
+    """
+    Return arrays `gene_rows` and `trait_rows`, with one row for every
+    combination of gene counts, and one for every combination of traits
+    that agrees with known information. Column `i` of each row describes
+    person `names[i]`: their number of copies of the gene (0, 1 or 2), or
+    whether they have the trait.
+    """
+    n = len(names)
+    full_mask = (1 << n) - 1
+
+    # Loop over all sets of people who might have the gene
+    one_masks = []
+    two_masks = []
+    for one_gene in powerset(n):
+        for two_genes in submasks(~one_gene & full_mask):
+            one_masks.append(one_gene)
+            two_masks.append(two_genes)
+
+    # Known traits, as a mask of people with known trait and their values
+    known_mask = 0
+    known_traits = 0
+    for i, person in enumerate(names):
+        if people[person]["trait"] is not None:
+            known_mask |= 1 << i
+            if people[person]["trait"]:
+                known_traits |= 1 << i
+
+    # Loop over all sets of people who might have the trait, skipping
+    # those that violate known information
+    trait_masks = [
+        have_trait for have_trait in powerset(n)
+        if have_trait & known_mask == known_traits
+    ]
+
+    # Expand bitmasks into one column per person
+    bits = np.arange(n)
+    gene_rows = (
+        ((np.array(one_masks)[:, None] >> bits) & 1) +
+        2 * ((np.array(two_masks)[:, None] >> bits) & 1)
+    ).astype(np.int8)
+    trait_rows = ((np.array(trait_masks)[:, None] >> bits) & 1).astype(bool)
+
+    return gene_rows, trait_rows
+
+
+def accumulate(trait_rows, gene_rows, mother_idx, father_idx, table):
+    """
+    Return arrays `gene_totals` and `trait_totals` holding, for each person,
+    the sum of joint probabilities of all pairings of a row of `gene_rows`
+    with a row of `trait_rows`, by that person's number of genes (columns
+    0, 1, 2) and trait (columns False, True).
+    """
+    # Pair every gene configuration with every trait configuration
+    gene_counts = np.tile(gene_rows, (len(trait_rows), 1))
+    trait_mask = np.repeat(trait_rows, len(gene_rows), axis=0)
+
+    # Compute joint probabilities for all configurations at once
+    p = joint_probabilities(gene_counts, trait_mask, mother_idx, father_idx, table)
+
+    num_people = gene_rows.shape[1]
+    gene_totals = np.empty((num_people, 3))
+    trait_totals = np.empty((num_people, 2))
+    for i in range(num_people):
+        gene_totals[i] = np.bincount(gene_counts[:, i], weights=p, minlength=3)
+        trait_totals[i] = np.bincount(trait_mask[:, i], weights=p, minlength=2)
+    return gene_totals, trait_totals
+
+
+# Arrays shared by every task of a worker process, set by `_init_worker`
+_worker_shared = None
+
+
+def _init_worker(*shared):
+    """
+    Store the read-only arguments of `accumulate` once per worker process.
+    """
+    global _worker_shared
+    _worker_shared = shared
+
+
+def _accumulate_chunk(trait_rows):
+    """
+    Run `accumulate` in a worker process on a chunk of `trait_rows`.
+    """
+    return accumulate(trait_rows, *_worker_shared)
+
+
+def parent_indices(people, names):
+    """
+    Return int32 arrays `mother_idx` and `father_idx` giving the column of
+    each person's mother and father in `names`. People without parents
+    are given their own column, so that every lookup stays in bounds.
+    """
+    index = {person: i for i, person in enumerate(names)}
+    mother_idx = np.array([
+        index[people[person]["mother"] or person] for person in names
+    ], dtype=np.int32)
+    father_idx = np.array([
+        index[people[person]["father"] or person] for person in names
+    ], dtype=np.int32)
+    return mother_idx, father_idx
+
+
+def factor_table(mother_idx, father_idx):
+    """
+    Return an array of each person's factor in the joint probability,
+    indexed by [person, num_genes, mother's num_genes, father's num_genes,
+    trait]. Factors of people without parents do not depend on the
+    parents' gene counts.
     """
-    Return a list of all possible subsets of set s.
+    # Probability of inheriting the gene from a parent with 0, 1 or 2 copies
+    mutation = PROBS["mutation"]
+    inherit = np.array([mutation, 0.5, 1 - mutation])
+    prob_inherit_mother = inherit[:, None]
+    prob_inherit_father = inherit[None, :]
+
+    # Probability of each number of genes given parents' number of genes
+    inherited = np.array([
+        (1 - prob_inherit_mother) * (1 - prob_inherit_father),
+        (1 - prob_inherit_mother) * prob_inherit_father +
+        prob_inherit_mother * (1 - prob_inherit_father),
+        prob_inherit_mother * prob_inherit_father
+    ])
+    unconditional = np.broadcast_to(
+        np.array([PROBS["gene"][g] for g in range(3)])[:, None, None], (3, 3, 3)
+    )
+    trait_probs = np.array([
+        [PROBS["trait"][g][False], PROBS["trait"][g][True]] for g in range(3)
+    ])
+
+    table = np.empty((len(mother_idx), 3, 3, 3, 2))
+    for i in range(len(mother_idx)):
+        has_parents = mother_idx[i] != i or father_idx[i] != i
+        prob_gene = inherited if has_parents else unconditional
+        table[i] = prob_gene[..., None] * trait_probs[:, None, None, :]
+    return table
+
+
+def joint_probabilities(gene_counts, trait_mask, mother_idx, father_idx, table):
     """
-    s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
+    Compute and return the joint probability of every configuration
+    described by the rows of `gene_counts` and `trait_mask`, as returned by
+    `configurations`, using factors from `factor_table`. Row `k` of the
+    result equals `joint_probability` for the sets of people encoded by
+    row `k` of the inputs.
+    """
+    if _NUMBA_AVAILABLE:
+        return _joint_probabilities_kernel(
+            gene_counts, trait_mask, mother_idx, father_idx, table
         )
+
+    factors = table[
+        np.arange(gene_counts.shape[1]),
+        gene_counts,
+        gene_counts[:, mother_idx],
+        gene_counts[:, father_idx],
+        trait_mask.astype(np.int8)
     ]
+    return np.prod(factors, axis=1)
+
+
+def _joint_probabilities_kernel(gene_counts, trait_mask, mother_idx, father_idx, table):
+    """
+    Loop form of `joint_probabilities`, compiled with Numba when available.
+    """
+    num_configs, num_people = gene_counts.shape
+    result = np.ones(num_configs)
+    for k in range(num_configs):
+        joint_prob = 1.0
+        for i in range(num_people):
+            joint_prob *= table[
+                i,
+                gene_counts[k, i],
+                gene_counts[k, mother_idx[i]],
+                gene_counts[k, father_idx[i]],
+                1 if trait_mask[k, i] else 0
+            ]
+        result[k] = joint_prob
+    return result
+
+
+if _NUMBA_AVAILABLE:
+    _joint_probabilities_kernel = numba.njit(cache=True)(_joint_probabilities_kernel)
 
 
 def joint_probability(people, one_gene, two_genes, have_trait):
@@ -214,13 +430,15 @@ def normalize(probabilities):
 
         # Normalize the "gene" distribution
         gene_distribution = probabilities[person]["gene"]
+        gene_total = sum(gene_distribution.values())
         for gene_count in gene_distribution:
-            gene_distribution[gene_count] /= sum(gene_distribution.values())
+            gene_distribution[gene_count] /= gene_total
 
         # Normalize the "trait" distribution
         trait_distribution = probabilities[person]["trait"]
+        trait_total = sum(trait_distribution.values())
         for trait_value in trait_distribution:
-            trait_distribution[trait_value] /= sum(trait_distribution.values())
+            trait_distribution[trait_value] /= trait_total
 
 
 if __name__ == "__main__":
@@ -1,11 +1,15 @@
 import os
-import random
 import re
 import sys
 
+import numpy as np
+
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Matches the target of every <a href="..."> link in raw HTML bytes
+_HREF_RE = re.compile(rb"<a\s+[^>]*?href=\"([^\"]*)\"")
+
 
 def main():
     if len(sys.argv) != 2:
@@ -36,10 +40,10 @@ def crawl(directory):
     for filename in os.listdir(directory):
         if not filename.endswith(".html"):
             continue
-        with open(os.path.join(directory, filename)) as f:
+        with open(os.path.join(directory, filename), "rb") as f:
             contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+            links = {link.decode() for link in _HREF_RE.findall(contents)}
+            pages[filename] = links - {filename}
 
     # Only include links to other pages in the corpus
     for filename in pages:
@@ -93,20 +97,37 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    page_rank = {page: 0 for page in corpus}
+    pages = list(corpus)
+    visits = np.zeros(len(pages), dtype=np.int64)
+
+    # Build the transition model of every page at once, as rows of a matrix
+    N = len(pages)
+    links = np.array([[p in corpus[page] for p in pages] for page in pages], dtype=bool).reshape(N, N)
+    num_links = links.sum(axis=1, keepdims=True)
+    probabilities = np.where(
+        num_links == 0,
+        1 / N,  # If the page has no outgoing links, choose randomly among all pages
+        (1 - damping_factor) / N + damping_factor * links / np.maximum(num_links, 1)
+    )
+
+    # Precompute the cumulative transition probabilities out of each page
+    cdfs = np.cumsum(probabilities, axis=1)
+    cdfs[:, -1] = 1.0  # Guard against rounding leaving the last bucket short
+
+    # Draw all random numbers needed for the samples at once
+    rng = np.random.default_rng()
+    draws = rng.random(n - 1)
 
     # Generate the first sample by choosing a page at random
-    current_page = random.choice(list(corpus.keys()))
-    page_rank[current_page] += 1 / n
+    current = rng.integers(len(pages))
+    visits[current] += 1
 
     # Generate remaining samples based on transition model
-    for _ in range(n - 1):
-        probabilities = transition_model(corpus, current_page, damping_factor)
-        next_page = random.choices(list(probabilities.keys()), list(probabilities.values()))[0]
-        page_rank[next_page] += 1 / n
-        current_page = next_page
+    for draw in draws:
+        current = np.searchsorted(cdfs[current], draw, side="right")
+        visits[current] += 1
 
-    return page_rank
+    return {page: float(visits[i] / n) for i, page in enumerate(pages)}
 
 
 def iterate_pagerank(corpus, damping_factor):
@@ -118,38 +139,37 @@ def iterate_pagerank(corpus, damping_factor):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    N = len(corpus)
-    initial_rank = 1 / N # The initial PageRank value assumed for each page
-    page_rank = {page: initial_rank for page in corpus} # Each page in the corpus is assigned the initial rank value
+    pages = list(corpus)
+    N = len(pages)
+    index = {page: i for i, page in enumerate(pages)}
+
+    # Every link as a (source, target) pair of page indices
+    source = np.array([index[page] for page in pages for link in corpus[page]], dtype=np.intp)
+    target = np.array([index[link] for page in pages for link in corpus[page]], dtype=np.intp)
+    num_links = np.array([len(corpus[page]) for page in pages])
+    dangling = num_links == 0 # Pages without links are treated as linking to every page
+
+    page_rank = np.full(N, 1 / N) # Each page in the corpus is assigned the initial rank value
     convergence_threshold = 0.001 # The level of change in PageRank values that indicates convergence
     has_converged = False
 
     # The while loop continues until the PageRank values have converged
     while not has_converged:
 
-        # Calculate the new ranks for all pages in the corpus
-        new_page_rank = {}
-        for page in corpus:
-            rank = (1 - damping_factor) / N # The probability of choosing the page at random divided by N
-
-            # Iterate over each linking page and its associated links
-            for linking_page, links in corpus.items():
-                if page in links:
-                    # The PageRank of the linking page contributes to the rank calculation of the current page
-                    rank += damping_factor * page_rank[linking_page] / len(links)
+        # Rank passed along each link, plus rank of pages without links shared by all pages
+        linked_rank = (
+            np.bincount(target, weights=page_rank[source] / num_links[source], minlength=N) +
+            page_rank[dangling].sum() / N
+        )
 
-            # Store the updated calculated PageRank value for the current page
-            new_page_rank[page] = rank
+        new_page_rank = (1 - damping_factor) / N + damping_factor * linked_rank
 
-        # Check if all page differences are smaller than the convergence threshold, has_converged becomes True, and the while loop terminates
-        has_converged = all(
-            abs(new_page_rank[page] - page_rank[page]) < convergence_threshold
-            for page in corpus
-        )
+        # Check if all page differences are smaller than the convergence threshold
+        has_converged = np.abs(new_page_rank - page_rank).max() < convergence_threshold
 
-        page_rank = new_page_rank # Updated with the new PageRank values stored in new_page_rank
+        page_rank = new_page_rank
 
-    return page_rank
+    return {page: float(page_rank[i]) for i, page in enumerate(pages)}
 
 
 if __name__ == "__main__":
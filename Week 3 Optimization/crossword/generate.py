@@ -1,5 +1,10 @@
+import multiprocessing
+import os
+import random
 import sys
 
+from collections import Counter, deque
+
 from crossword import *
 
 
@@ -14,6 +19,23 @@ class CrosswordCreator():
             var: self.crossword.words.copy()
             for var in self.crossword.variables
         }
+        self.letter_counts = dict()
+        self.indexed_domains = dict()  # A copy of the domain each variable's letter counts were built from
+
+        # Count changes to each domain, and the domain versions each arc was last made consistent at
+        self.domain_versions = {var: 0 for var in self.domains}
+        self.last_checked = dict()
+
+        # Cache the constraint graph, which is looked up throughout the search
+        self.neighbors = {
+            var: frozenset(self.crossword.neighbors(var))
+            for var in self.crossword.variables
+        }
+        self.overlaps = dict(self.crossword.overlaps)
+
+        # Used by `solve_parallel` to vary the search and stop it early
+        self.rng = None
+        self.stop_event = None
 
 
     def letter_grid(self, assignment):
@@ -99,6 +121,26 @@ class CrosswordCreator():
         return self.backtrack(dict())
 
 
+    def solve_parallel(self, k=None):
+        """
+        Enforce node and arc consistency, and then solve the CSP with `k`
+        processes (by default, one per CPU) racing each other. Each process
+        breaks ties between equally constraining values in a different random
+        order; the first solution found is returned, and the rest are stopped.
+        """
+        self.enforce_node_consistency()
+        self.ac3()
+
+        k = k or os.cpu_count() or 1
+        stop_event = multiprocessing.Event()
+        with multiprocessing.Pool(k, initializer=_init_worker, initargs=(self, stop_event)) as pool:
+            for result in pool.imap_unordered(_solve_with_seed, range(k)):
+                if result is not None:
+                    stop_event.set()
+                    return result
+        return None
+
+
     def enforce_node_consistency(self):
         """
         Update `self.domains` such that each variable is node-consistent.
@@ -114,6 +156,45 @@ class CrosswordCreator():
                 if len(value) != length:
                     self.domains[var].remove(value)
 
+            self.domain_versions[var] += 1
+            self.index_letters(var)
+
+
+    def index_letters(self, var):
+        """
+        Update `self.letter_counts[var]`, which counts, for each position,
+        how many words in the domain of `var` have each letter there.
+        """
+        self.letter_counts[var] = [Counter() for _ in range(var.length)]
+        for value in self.domains[var]:
+            for counts, letter in zip(self.letter_counts[var], value):
+                counts[letter] += 1
+        self.indexed_domains[var] = set(self.domains[var])
+
+
+    def unindex_letters(self, var, value):
+        """
+        Update `self.letter_counts[var]` after `value` is removed from the
+        domain of `var`. Letters no longer found at a position are dropped.
+        """
+        for counts, letter in zip(self.letter_counts[var], value):
+            counts[letter] -= 1
+            if not counts[letter]:
+                del counts[letter]
+        self.indexed_domains[var].discard(value)
+
+
+    def sync_letters(self, var):
+        """
+        Rebuild `self.letter_counts[var]` if the domain of `var` no longer
+        holds the words it was last indexed from (e.g. after changing
+        `self.domains` directly rather than through `revise`), and count that
+        as a change to the domain so cached arc checks are redone.
+        """
+        if self.indexed_domains.get(var) != self.domains[var]:
+            self.domain_versions[var] = self.domain_versions.get(var, 0) + 1
+            self.index_letters(var)
+
 
     def revise(self, x, y):
         """
@@ -127,24 +208,31 @@ class CrosswordCreator():
         revised = False
 
         # Check if there is an overlap between variables x and y
-        overlap = self.crossword.overlaps[x, y]
+        overlap = self.overlaps[x, y]
+        if overlap is None:
+            return False
 
-        if overlap is not None:
-            i, j = overlap
-            domain_x = self.domains[x].copy()
+        i, j = overlap
+        for var in (x, y):
+            self.sync_letters(var)
 
-            # Iterate over each value value_x in the domain of x
-            for value_x in domain_x:
+        # Skip the arc if neither domain has changed since it was last made consistent
+        if self.last_checked.get((x, y)) == (self.domain_versions[x], self.domain_versions[y]):
+            return False
 
-                has_corresponding_value = any(
-                    value_x[i] == value_y[j] for value_y in self.domains[y]
-                )  # Keep value_x in the domain of x if there is at least one corresponding value
+        # Letters at x's ith position that no value in the domain of y has at its jth position
+        unsupported = self.letter_counts[x][i].keys() - self.letter_counts[y][j].keys()
 
-                # Otherwise, remove value_x from the domain of x
-                if not has_corresponding_value:
-                    self.domains[x].remove(value_x)
-                    revised = True
+        # Every other value_x has at least one corresponding value, so x only needs revising if some letter is unsupported
+        if unsupported:
+            removed = [value_x for value_x in self.domains[x] if value_x[i] in unsupported]
+            for value_x in removed:
+                self.domains[x].remove(value_x)
+                self.unindex_letters(x, value_x)
+            self.domain_versions[x] += 1
+            revised = True
 
+        self.last_checked[x, y] = (self.domain_versions[x], self.domain_versions[y])
         return revised
 
 
@@ -158,19 +246,19 @@ class CrosswordCreator():
         return False if one or more domains end up empty.
         """
         if arcs is None:
-            arcs = self.crossword.overlaps.keys()  # Set arcs to be all the arcs in the problem
+            arcs = self.overlaps.keys()  # Set arcs to be all the arcs in the problem
 
-        queue = list(arcs)
+        queue = deque(arcs)
 
         while queue:  # Continue until the queue is empty
-            x, y = queue.pop(0)  # Extract an arc (x, y) from the front of the queue
+            x, y = queue.popleft()  # Extract an arc (x, y) from the front of the queue
 
             if self.revise(x, y):  # Call the revise function to make x arc consistent with y
                 if len(self.domains[x]) == 0:  # Check if the domain of x is empty
                     return False  # It's impossible to solve the problem with an empty domain
 
                 # Add all the neighbors of x except y to the queue to ensure their consistency with x
-                for z in self.crossword.neighbors(x) - {y}:
+                for z in self.neighbors[x] - {y}:
                     queue.append((z, x))
 
         return True
@@ -201,7 +289,7 @@ class CrosswordCreator():
         for variable1, word1 in assignment.items():
             for variable2, word2 in assignment.items():
                 if variable1 != variable2:
-                    overlap = self.crossword.overlaps[variable1, variable2]
+                    overlap = self.overlaps[variable1, variable2]
                     if overlap:
                         i, j = overlap
                         if word1[i] != word2[j]:
@@ -210,6 +298,26 @@ class CrosswordCreator():
         return True
 
 
+    def consistent_with(self, var, value, assignment, used_words):
+        """
+        Return True if adding `var` = `value` to the consistent `assignment`
+        keeps it consistent (i.e., `value` is not in `used_words` and does not
+        conflict with any assigned neighbor of `var`); return False otherwise.
+        """
+        # Check for word uniqueness
+        if value in used_words:
+            return False
+
+        # Check for conflicts with assigned neighbors only
+        for neighbor in self.neighbors[var]:
+            if neighbor in assignment:
+                i, j = self.overlaps[var, neighbor]
+                if value[i] != assignment[neighbor][j]:
+                    return False
+
+        return True
+
+
     def order_domain_values(self, var, assignment):
         """
         Return a list of values in the domain of `var`, in order by
@@ -220,20 +328,25 @@ class CrosswordCreator():
         domain = list(self.domains[var])  # All the values in the domain of the current variable
         count_values = []  # Create a list to store tuples of values and their corresponding counts
 
-        for value in domain:
-            count = 0
+        # Overlapping positions with each unassigned neighbor
+        arcs = []
+        for neighbor in self.neighbors[var]:
+            if neighbor not in assignment:
+                self.sync_letters(neighbor)
+                i, j = self.overlaps[var, neighbor]
+                arcs.append((len(self.domains[neighbor]), self.letter_counts[neighbor][j], i))
 
-            for neighbor in self.crossword.neighbors(var):
-                if neighbor not in assignment:
-                    overlap = self.crossword.overlaps[var, neighbor]
+        for value in domain:
 
-                    # Count the number of the neighbor's domain values that aren't equal to the current value
-                    if overlap is not None:
-                        count += sum(1 for val in self.domains[neighbor] if val != value)
+            # Count the number of the neighbors' domain values without the current value's letter at the overlap
+            count = sum(size - letter_counts[value[i]] for size, letter_counts, i in arcs)
 
             count_values.append((value, count))  # Store the value along with its count as a tuple
 
-        count_values.sort(key=lambda x: x[1])  # Sort the count_values list based on the count
+        if self.rng is None:
+            count_values.sort(key=lambda x: x[1])  # Sort the count_values list based on the count
+        else:
+            count_values.sort(key=lambda x: (x[1], self.rng.random()))  # Break ties in count at random
         domain = [value for value, _ in count_values]  # Update the domain with the value from the count_values list
 
         return domain
@@ -260,20 +373,28 @@ class CrosswordCreator():
             return tied_variables[0]
 
         # Sort the tied variables based on the number of neighbors (degree heuristic)
-        tied_variables.sort(key=lambda var: len(self.crossword.neighbors(var)), reverse=True)
+        tied_variables.sort(key=lambda var: len(self.neighbors[var]), reverse=True)
 
         return tied_variables[0]
 
 
-    def backtrack(self, assignment):
+    def backtrack(self, assignment, used_words=None):
         """
         Using Backtracking Search, take as input a partial assignment for the
         crossword and return a complete assignment if possible to do so.
 
         `assignment` is a mapping from variables (keys) to words (values).
+        `used_words` is the set of words in `assignment`, kept up to date
+        across recursive calls.
 
         If no assignment is possible, return None.
         """
+        if self.stop_event is not None and self.stop_event.is_set():
+            return None  # Another process has already found a solution
+
+        if used_words is None:
+            used_words = set(assignment.values())
+
         if self.assignment_complete(assignment):
             return assignment  # Return the assignment as it is a satisfactory solution
 
@@ -281,19 +402,49 @@ class CrosswordCreator():
 
         # Iterate over the selected variable's domain's values ordered by the order_domain_values function
         for value in self.order_domain_values(var, assignment):
-            assignment[var] = value  # Assign the value to the variable, add it to the assignment
 
-            if self.consistent(assignment):
-                result = self.backtrack(assignment)  # Recursively call the backtrack function
+            # Only the new value can break consistency, so check it against the assigned neighbors
+            if self.consistent_with(var, value, assignment, used_words):
+                assignment[var] = value  # Assign the value to the variable, add it to the assignment
+                used_words.add(value)
+
+                result = self.backtrack(assignment, used_words)  # Recursively call the backtrack function
 
                 if result is not None:
                     return result  # Terminate early and return a valid assignment as soon as one is found
 
-            del assignment[var]  # Remove the current value for the variable and continue with the next value
+                del assignment[var]  # Remove the current value for the variable and continue with the next value
+                used_words.discard(value)
 
         return None  # No satisfying assignment is possible
 
 
+# Creator used by every task of a worker process, set by `_init_worker`
+_worker_creator = None
+
+
+def _init_worker(creator, stop_event):
+    """
+    Store the consistent `creator` and the shared `stop_event` once per
+    worker process of `CrosswordCreator.solve_parallel`.
+    """
+    global _worker_creator
+    creator.stop_event = stop_event
+    _worker_creator = creator
+
+
+def _solve_with_seed(seed):
+    """
+    Run backtracking search in a worker process, breaking ties in value
+    order with random seed `seed` (seed 0 keeps the default order).
+    """
+    _worker_creator.rng = random.Random(seed) if seed else None
+    result = _worker_creator.backtrack(dict())
+    if result is not None:
+        _worker_creator.stop_event.set()
+    return result
+
+
 def main():
 
     # Check usage
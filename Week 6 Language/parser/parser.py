@@ -1,4 +1,5 @@
 import nltk
+import re
 import sys
 
 TERMINALS = """
@@ -23,7 +24,10 @@ VP -> V P | Adv V NP | VP Conj VP | V NP Adv NP Conj VP
 """
 
 grammar = nltk.CFG.fromstring(NONTERMINALS + TERMINALS)
-parser = nltk.ChartParser(grammar)
+parser = nltk.parse.BottomUpLeftCornerChartParser(grammar)
+
+# Matches any alphabetic character (a word character that is not a digit or underscore)
+_ALPHA_RE = re.compile(r"[^\W\d_]")
 
 
 def main():
@@ -70,7 +74,7 @@ def preprocess(sentence):
     words = nltk.word_tokenize(sentence)
 
     # Filter out words that do not contain at least one alphabetic character
-    processed_words = [word.lower() for word in words if any(char.isalpha() for char in word)]
+    processed_words = [word.lower() for word in words if _ALPHA_RE.search(word)]
     return processed_words
 
 
@@ -81,17 +85,32 @@ def np_chunk(tree):
     whose label is "NP" that does not itself contain any other
     noun phrases as subtrees.
     """
-    chunks = []
+    chunks, _ = _np_chunks(tree)
+    return chunks
 
-    # Check if the current tree node has the label 'NP' and doesn't contain any other subtrees with the label 'NP'
-    if tree.label() == 'NP' and not any(subtree.label() == 'NP' for subtree in tree.subtrees() if subtree != tree):
-        chunks.append(tree)
 
-    # Recursively calls itself on each subtree
+def _np_chunks(tree):
+    """
+    Return the noun phrase chunks in `tree`, and whether `tree` contains
+    any noun phrase at all (including `tree` itself), in a single pass.
+    """
+    chunks = []
+    contains_np = False
+
+    # Recursively collect chunks from each subtree, noting whether any of them holds a noun phrase
     for subtree in tree:
         if isinstance(subtree, nltk.Tree):
-            chunks.extend(np_chunk(subtree))  # Search for more noun phrase chunks within the subtree
-    return chunks
+            subtree_chunks, subtree_contains_np = _np_chunks(subtree)
+            chunks.extend(subtree_chunks)
+            contains_np = contains_np or subtree_contains_np
+
+    # A noun phrase is a chunk only if none of its subtrees is a noun phrase
+    if tree.label() == 'NP':
+        if not contains_np:
+            chunks.append(tree)
+        contains_np = True
+
+    return chunks, contains_np
 
 
 if __name__ == "__main__":
@@ -1,15 +1,29 @@
-import math
+import heapq
+import multiprocessing
 import nltk
+import numpy as np
 import os
+import re
 import sys
-import string
 
+from collections import Counter, defaultdict
+from itertools import islice
 from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
+from operator import itemgetter
 
 FILE_MATCHES = 1
 SENTENCE_MATCHES = 1
 
+# Total characters in the corpus above which files are tokenized across processes
+PARALLEL_THRESHOLD = 1 << 22
+
+# Words to filter out of documents, loaded once for fast lookups
+_STOPWORDS = frozenset(stopwords.words("english"))
+
+# Runs of letters and digits, possibly joined by apostrophes or hyphens (e.g. "don't", "real-time"),
+# with a possessive "'s" left out of the word (e.g. "python's" -> "python")
+_WORD_RE = re.compile(r"([^\W_]+(?:['-][^\W_]+)*?)(?:'s)?(?![^\W_]|['-][^\W_])")
+
 
 def main():
 
@@ -19,17 +33,25 @@ def main():
 
     # Calculate IDF values across files
     files = load_files(sys.argv[1])
-    file_words = {
-        filename: tokenize(files[filename])
-        for filename in files
-    }
+    if len(files) < 2 or sum(map(len, files.values())) < PARALLEL_THRESHOLD:
+        file_words = {filename: tokenize(contents) for filename, contents in files.items()}
+    else:
+        with multiprocessing.Pool() as pool:
+            results = pool.map(tokenize, files.values())  # Tokenize files in parallel, keeping their order
+
+        # Words come back from the workers as new strings, so intern them again here
+        file_words = {filename: [sys.intern(word) for word in words] for filename, words in zip(files, results)}
     file_idfs = compute_idfs(file_words)
+    file_index = index_files(file_words)
+    file_postings = index_postings(file_words)
+    file_positions = index_positions(file_words)
 
     # Prompt user for query
     query = set(tokenize(input("Query: ")))
 
     # Determine top file matches according to TF-IDF
-    filenames = top_files(query, file_words, file_idfs, n=FILE_MATCHES)
+    filenames = top_files(query, file_words, file_idfs, n=FILE_MATCHES, index=file_index, postings=file_postings,
+                          positions=file_positions)
 
     # Extract sentences from top files
     sentences = dict()
@@ -42,9 +64,10 @@ def main():
 
     # Compute IDF values across sentences
     idfs = compute_idfs(sentences)
+    sentence_index = index_sentences(sentences)
 
     # Determine top sentence matches
-    matches = top_sentences(query, sentences, idfs, n=SENTENCE_MATCHES)
+    matches = top_sentences(query, sentences, idfs, n=SENTENCE_MATCHES, index=sentence_index)
     for match in matches:
         print(match)
 
@@ -73,11 +96,11 @@ def tokenize(document):
     Process document by coverting all words to lowercase, and removing any
     punctuation or English stopwords.
     """
-    # Tokenize the document into words
-    words = word_tokenize(document)
+    # Lowercase the whole document once, and split it into words in a single pass
+    words = _WORD_RE.findall(document.lower())
 
-    # Filter out punctuation and stopwords
-    filtered_words = [word.lower() for word in words if word.lower() not in string.punctuation and word.lower() not in stopwords.words("english")]
+    # Filter out stopwords, interning the rest so that repeated words share one string
+    filtered_words = [sys.intern(word) for word in words if word not in _STOPWORDS]
 
     return filtered_words
 
@@ -90,74 +113,151 @@ def compute_idfs(documents):
     Any word that appears in at least one of the documents should be in the
     resulting dictionary.
     """
-    idfs = {}  # Dictionary to store IDF values
-
     total_documents = len(documents)  # Total number of documents
 
     # Count the number of documents in which each word appears
-    word_documents_count = {}
+    document_counts = Counter()
     for document in documents.values():
-        for word in set(document):
-            word_documents_count[word] = word_documents_count.get(word, 0) + 1
+        document_counts.update(set(document))
+
+    # Calculate IDF for all words at once, in place in a single buffer
+    idf_values = np.fromiter(document_counts.values(), dtype=np.float64, count=len(document_counts))
+    np.divide(total_documents, idf_values, out=idf_values)
+    np.log(idf_values, out=idf_values)
+
+    return dict(zip(document_counts, idf_values.tolist()))
+
+
+def index_files(files):
+    """
+    Given `files` (a dictionary mapping names of files to a list of their
+    words), return a dictionary mapping names of files to a Counter of
+    their words, to be reused by `top_files` across queries.
+    """
+    return {filename: Counter(words) for filename, words in files.items()}
+
+
+def index_postings(files):
+    """
+    Given `files` (a dictionary mapping names of files to a list of their
+    words), return a dictionary mapping each word to the set of names of
+    files it appears in, to be reused by `top_files` across queries.
+    """
+    postings = defaultdict(set)
+    for filename, words in files.items():
+        for word in set(words):
+            postings[word].add(filename)
+    return dict(postings)
 
-    # Calculate IDF for each word
-    for word, document_count in word_documents_count.items():
-        idfs[word] = math.log(total_documents / document_count)
 
-    return idfs
+def index_positions(files):
+    """
+    Given `files` (a dictionary mapping names of files to a list of their
+    words), return a dictionary mapping names of files to their position in
+    `files`, to be reused by `top_files` across queries to break ties.
+    """
+    return {filename: position for position, filename in enumerate(files)}
+
+
+def index_sentences(sentences):
+    """
+    Given `sentences` (a dictionary mapping sentences to a list of their
+    words), return a dictionary mapping sentences to a tuple of the set of
+    their words and their number of words, to be reused by `top_sentences`
+    across queries.
+    """
+    return {sentence: (frozenset(words), len(words)) for sentence, words in sentences.items()}
 
 
-def top_files(query, files, idfs, n):
+def top_files(query, files, idfs, n, index=None, postings=None, positions=None):
     """
     Given a `query` (a set of words), `files` (a dictionary mapping names of
     files to a list of their words), and `idfs` (a dictionary mapping words
     to their IDF values), return a list of the filenames of the the `n` top
     files that match the query, ranked according to tf-idf.
+
+    `index`, `postings` and `positions`, if given, are the results of
+    `index_files(files)`, `index_postings(files)` and `index_positions(files)`.
     """
     file_scores = {}  # Dictionary to store file scores
 
-    # Calculate the tf-idf score for each file
-    for filename, words in files.items():
-        score = 0
-        for word in query:
-            if word in words:
-                score += words.count(word) * idfs[word]
-        file_scores[filename] = score
+    # Skip query words that appear in no file, and look up the IDF of the rest once
+    query = set(query) & idfs.keys()
+    query_idfs = [(word, idfs[word]) for word in query]
 
-    # Sort the files based on the scores in descending order
-    sorted_files = sorted(file_scores.items(), key=lambda x: x[1], reverse=True)
+    # Count every word of each file once, rather than once per query word
+    file_counters = index if index is not None else index_files(files)
 
-    # Get the top n files
-    top_n_files = [filename for filename, _ in sorted_files[:n]]
+    # Only files containing a query word can score above zero
+    if postings is None:
+        postings = index_postings(files)
+    matching_files = set().union(*(postings.get(word, ()) for word, _ in query_idfs))
+
+    # Calculate the tf-idf score for each of those files
+    for filename in matching_files:
+        counts = file_counters[filename]
+        score = sum(counts[word] * idf for word, idf in query_idfs)
+        if score > 0:
+            file_scores[filename] = score
+
+    # Select the n files with the highest scores, in descending order, preferring earlier files on ties
+    if positions is None:
+        positions = index_positions(files)
+    best_files = heapq.nlargest(n, file_scores.items(), key=lambda item: (item[1], -positions[item[0]]))
+
+    # Get the top n files, filling any remaining places with files scoring zero
+    top_n_files = [filename for filename, _ in best_files]
+    if len(top_n_files) < n:
+        zero_files = (filename for filename in files if filename not in file_scores)
+        top_n_files.extend(islice(zero_files, n - len(top_n_files)))
 
     return top_n_files
 
 
-def top_sentences(query, sentences, idfs, n):
+def top_sentences(query, sentences, idfs, n, index=None):
     """
     Given a `query` (a set of words), `sentences` (a dictionary mapping
     sentences to a list of their words), and `idfs` (a dictionary mapping words
     to their IDF values), return a list of the `n` top sentences that match
     the query, ranked according to idf. If there are ties, preference should
     be given to sentences that have a higher query term density.
+
+    `index`, if given, is the result of `index_sentences(sentences)`.
     """
+    idf_scores = {}  # Dictionary to store sentence IDF scores
     sentence_scores = {}  # Dictionary to store sentence scores
 
-    # Calculate the IDF score and query term density for each sentence
-    for sentence, words in sentences.items():
+    # Skip query words that appear in no sentence, and look up the IDF of the rest once
+    query = set(query) & idfs.keys()
+    query_idfs = [(word, idfs[word]) for word in query]
+
+    if index is None:
+        index = index_sentences(sentences)
+
+    # Calculate the relevance of each sentence to the query based on the IDF values of the matching words
+    for sentence, (words_set, _) in index.items():
+        idf_scores[sentence] = sum(idf for word, idf in query_idfs if word in words_set)
+
+    # Only sentences scoring at least the nth highest IDF score can be among the top n
+    top_idf_scores = heapq.nlargest(n, idf_scores.values())
+    if not top_idf_scores:
+        return []
+    cutoff = top_idf_scores[-1]
 
-        # Calculate the relevance of the sentence to the query based on the IDF values of the matching words
-        idf_score = sum(idfs[word] for word in query if word in words)
+    # Calculate the query term density of those sentences only, to break ties
+    for sentence, idf_score in idf_scores.items():
+        if idf_score >= cutoff:
+            _, length = index[sentence]
 
-        # Calculate the proportion of words in the sentence that are also in the query
-        query_density = sum(word in query for word in words) / len(words)
-        sentence_scores[sentence] = (idf_score, query_density)
+            # Calculate the proportion of words in the sentence that are also in the query
+            query_density = sum(map(query.__contains__, sentences[sentence])) / length
+            sentence_scores[sentence] = (idf_score, query_density)
 
-    # Sort the sentences based on the scores in descending order
-    sorted_sentences = sorted(sentence_scores.items(), key=lambda x: (x[1][0], x[1][1]), reverse=True)
+    # Select the n sentences with the highest scores, in descending order
+    best_sentences = heapq.nlargest(n, sentence_scores.items(), key=itemgetter(1))
 
     # Get the top n sentences
-    top_n_sentences = [sentence for sentence, _ in sorted_sentences[:n]]
+    top_n_sentences = [sentence for sentence, _ in best_sentences]
 
     return top_n_sentences
 